@@ -1,7 +1,6 @@
 
 import argparse
 import sys
-import logging
 
 from abb.list_files import parser_list
 from abb.audiobook import parser_build
@@ -27,6 +26,7 @@ def main() -> None:
         sys.exit(1)
 
     if args.verbose:
+        import logging
         logging.basicConfig(level=logging.DEBUG)
 
     # Execute the command
@@ -1,14 +1,41 @@
 
+import os
 import shutil
 import tempfile
-import zipfile
-import tarfile
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, BinaryIO, List, Optional
+
+if TYPE_CHECKING:
+    import zipfile
+
+from .const import COPY_BUFSIZE
+
+# optional faster decompressors
+try:
+    import indexed_bzip2
+except ImportError:
+    indexed_bzip2 = None
+
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
 
 PREFIX = "abb_"
 
+# minimal .bz2 size to decompress in parallel
+PARALLEL_BZ2_THRESHOLD = 16 << 20
+
+# maximal threads to extract zip members
+MAX_ZIP_WORKERS = 8
+
+def _open_parallel_bz2(path: Path):
+    """Open a .bz2 file, decompressing blocks on all cores"""
+    return indexed_bzip2.open(str(path), parallelization=os.cpu_count() or 1)
+
 class UnsupportedArchiveFormat(Exception):
     """Raised when an unsupported archive format is encountered"""
     pass
@@ -32,10 +59,12 @@ class ArchiveExtractor:
             raise FileNotFoundError(f"Archive not found: {self.archive_path}")
 
         suffix = self.archive_path.suffix.lower()
+        # suffix is only the last one, e.g. ".gz" for ".tar.gz"
+        name = self.archive_path.name.lower()
 
         if suffix == ".zip":
             self._extract_zip()
-        elif suffix in [".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz"]:
+        elif name.endswith((".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")):
             self._extract_tar()
         elif suffix in [".gz", ".bz2", ".xz"]:
             self._extract_single_file()
@@ -43,15 +72,78 @@ class ArchiveExtractor:
             raise UnsupportedArchiveFormat(f"Unsupported archive format: {suffix}")
 
     def _extract_zip(self) -> None:
+        import zipfile
+
+        if self.temp_dir is None:
+            raise ValueError("Temporary directory has not been initialized")
+
+        temp_dir = self.temp_dir
         with zipfile.ZipFile(self.archive_path, "r") as zf:
-            zf.extractall(self.temp_dir)
+            infos = zf.infolist()
+
+        # ZipFile is not thread-safe, so each thread opens its own handle
+        local = threading.local()
+        handles: List["zipfile.ZipFile"] = []
+
+        def extract_one(info: "zipfile.ZipInfo") -> None:
+            if not hasattr(local, "zf"):
+                local.zf = zipfile.ZipFile(self.archive_path, "r")
+                handles.append(local.zf)
+            self._extract_zip_member(local.zf, info, temp_dir)
+
+        workers = min(MAX_ZIP_WORKERS, os.cpu_count() or 1, len(infos) or 1)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(extract_one, infos))
+        finally:
+            for handle in handles:
+                handle.close()
+
+    @staticmethod
+    def _extract_zip_member(zf: "zipfile.ZipFile", info: "zipfile.ZipInfo", 
+        temp_dir: Path) -> None:
+        root = os.path.abspath(temp_dir)
+        target = os.path.abspath(os.path.join(root, info.filename))
+        # don't let untrusted archives write outside of the temporary directory
+        if os.path.commonpath([root, target]) != root:
+            raise ValueError(f"Unsafe path in archive: {info.filename}")
+
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+            return
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with zf.open(info, "r") as f_in, open(target, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, length=COPY_BUFSIZE)
 
     def _extract_tar(self) -> None:
+        import tarfile
+
         if self.temp_dir is None:
             raise ValueError("Temporary directory has not been initialized")
             
-        with tarfile.open(self.archive_path, "r:*") as tf:
-            tf.extractall(self.temp_dir)
+        stream = self._open_tar_stream()
+        if stream is None:
+            with tarfile.open(self.archive_path, "r:*", 
+                copybufsize=COPY_BUFSIZE) as tf:
+                tf.extractall(self.temp_dir)
+        else:
+            with stream, tarfile.open(fileobj=stream, mode="r|", 
+                copybufsize=COPY_BUFSIZE) as tf:
+                tf.extractall(self.temp_dir)
+
+    def _open_tar_stream(self) -> Optional[BinaryIO]:
+        """Open the decompressed tar stream with a faster decoder, if installed"""
+        name = self.archive_path.name.lower()
+
+        if name.endswith((".tar.gz", ".tgz")) and igzip is not None:
+            return igzip.open(self.archive_path, "rb")
+
+        if (name.endswith((".tar.bz2", ".tbz2")) and indexed_bzip2 is not None
+            and self.archive_path.stat().st_size > PARALLEL_BZ2_THRESHOLD):
+            return _open_parallel_bz2(self.archive_path)
+
+        return None
 
     def _extract_single_file(self) -> None:
         import gzip, bz2, lzma
@@ -62,9 +154,16 @@ class ArchiveExtractor:
             ".xz": lzma.open,
         }
 
+        if igzip is not None:
+            open_fn_map[".gz"] = igzip.open
+
         suffix = self.archive_path.suffix.lower()
         open_fn = open_fn_map.get(suffix)
 
+        if (suffix == ".bz2" and indexed_bzip2 is not None
+            and self.archive_path.stat().st_size > PARALLEL_BZ2_THRESHOLD):
+            open_fn = _open_parallel_bz2
+
         if open_fn is None:
             raise UnsupportedArchiveFormat(f"Unsupported single-file compression: {suffix}")
 
@@ -75,5 +174,13 @@ class ArchiveExtractor:
         output_name = self.archive_path.stem
         output_path = self.temp_dir / output_name
 
-        with open_fn(self.archive_path, "rb") as f_in, open(output_path, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
+        # all openers default to binary reading
+        with open_fn(self.archive_path) as f_in, open(output_path, "wb") as f_out:
+            # re-use one buffer, instead of allocating bytes per chunk
+            buffer = bytearray(COPY_BUFSIZE)
+            view = memoryview(buffer)
+            while True:
+                n = f_in.readinto(buffer)
+                if not n:
+                    break
+                f_out.write(view[:n])
@@ -2,72 +2,463 @@ import argparse
 import os
 import shutil
 import tempfile
-import platform
 import logging
-import ffmpeg
+import math
 import subprocess
+import hashlib
+import re
+import threading
 
 from abc import (ABC, abstractmethod)
-from typing import List
-from tqdm import tqdm
+from collections import deque
+from concurrent.futures import (ThreadPoolExecutor, as_completed)
+from typing import (Any, Dict, Iterator, List, Optional, Tuple)
 
-from .const import (DEFAULT_BITRATE, DEFAULT_ENCODING)
-from .utils import is_media_extension
+from .const import (AAC_ENCODER_ARGS, AAC_ENCODERS, BITRATE_TOLERANCE, CACHE_DIR, DEFAULT_BITRATE, 
+    DEFAULT_ENCODING, SEGMENT_LEAD_IN, TEMP_PREFIX)
+from .encoder import probe_encoders, select_aac_encoder
+from .utils import (is_media_extension, link_or_copy, mp4_duration, parse_bitrate,
+    write_file)
+
+# optional compiled multi-keyword matcher
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# optional in-process prober, instead of an ffprobe process per file
+try:
+    import av
+except ImportError:
+    av = None
+
+# line of the chapter file, e.g. '00:10:00 chapter 2'
+CHAPTER_LINE_RE = re.compile(r'\s*(\d+):(\d+):(\d+)\s+(\S.*?)\s*')
+
+# characters to escape in ffmetadata values
+FFMETADATA_SPECIAL_RE = re.compile(r'[=;#\\\n]')
+
+# RAM-backed directory for intermediate files, on Linux
+RAM_DIR = "/dev/shm"
+
+# extensions of the mp4 family, with a mvhd header and accepting -movflags
+MP4_EXTENSIONS = (".m4b", ".m4a", ".mp4", ".mov")
+
+# options of every ffmpeg run, no interaction on stdin (which may carry data)
+# and no banner to print and drain
+FFMPEG_GLOBAL_ARGS = ['-nostdin', '-hide_banner']
+
+# lines of ffmpeg's stderr kept for diagnostics in quiet mode
+STDERR_TAIL_LINES = 200
+
+def concat_line(path: str) -> str:
+    """Line of a concat demuxer list, quotes in the path are escaped"""
+    return "file '" + path.replace("'", "'\\''") + "'\n"
+
+def metadata_value(text: str) -> str:
+    """Value of an ffmetadata file, special characters are escaped"""
+    return FFMETADATA_SPECIAL_RE.sub(r'\\\g<0>', text)
 
 class AudioBookBuilder(ABC):
     def __init__(self, 
         bitrate : str = DEFAULT_BITRATE,
         re_encode : bool = True,
-        verbose : bool = False) -> None:
+        verbose : bool = False,
+        jobs : Optional[int] = None,
+        cache_dir : Optional[str] = None,
+        segment_length : float = 0,
+        encoder : Optional[str] = None) -> None:
         """
         ABB base class to handle audiobook building.
         :param bitrate: Bitrate for re-encoding audio files.
-        :param re_encode: Force re-encode all files, even if they are already in .m4a format.
+        :param re_encode: Re-encode files to AAC at the bitrate, except AAC-LC audio not above
+            it, which is copied. If False, .m4a files and AAC-LC audio at any bitrate are copied.
         :param verbose: Verbose mode.
+        :param jobs: Number of files converted concurrently, None for the number of CPUs.
+        :param cache_dir: Directory to keep converted files between runs, None to disable.
+        :param segment_length: Length in seconds of the segments a long file is split into
+            and encoded in parallel, 0 to disable.
+        :param encoder: ffmpeg AAC encoder, None to pick the fastest one available.
         """
+        if jobs is not None and jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+
+        if segment_length < 0:
+            raise ValueError(f"Invalid segment length: {segment_length}")
+
         self.bitrate = bitrate
         self.re_encode = re_encode
         self.verbose = verbose
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.segment_length = segment_length
+        # concurrent segment encodes of one file, see _segment_encode()
+        self._segment_workers = self.jobs
+        # split the CPUs between concurrent ffmpeg jobs, to not oversubscribe
+        self._ffmpeg_threads = self._threads_per_job(self.jobs)
+        # created by the subclasses
+        self.temp_dir : str
+
+        # selected on the first encode, builds that only copy never probe it
+        self._requested_encoder = encoder
+        self._aac_encoder : Optional[str] = None
+        self._encoder_lock = threading.Lock()
+        self._build_argv_templates()
+
+        # cached ffmpeg.probe results, keyed by file path
+        self._probes : Dict[str, Dict[str, Any]] = {}
+        # cached durations in seconds, keyed by file path
+        self._durations : Dict[str, float] = {}
+
+    @staticmethod
+    def _threads_per_job(workers: int) -> int:
+        """ffmpeg threads of each job, 0 (auto) when there is a single job"""
+        if workers <= 1:
+            return 0
+        return max(1, (os.cpu_count() or 1) // workers)
 
     @property
     def aac_encoder(self) -> str:
-        """Select hardware AAC encoder based on platform"""
-        # FIXME: dynamic probing for available encoders
-        system = platform.system()
-        if system == "Windows":
-            logging.debug("Using Windows Media Foundation AAC encoder")
-            return "aac_mf"
-        elif system == "Darwin":
-            logging.debug("Using Apple AudioToolbox AAC encoder")
-            return "aac_at"
+        """AAC encoder used for re-encoding, selected once on first use"""
+        if self._aac_encoder is None:
+            # concurrent conversions wait for a single selection
+            with self._encoder_lock:
+                if self._aac_encoder is None:
+                    self._aac_encoder = self._select_aac_encoder(self._requested_encoder)
+        return self._aac_encoder
+
+    @staticmethod
+    def _select_aac_encoder(encoder: Optional[str] = None) -> str:
+        """Select the given AAC encoder if ffmpeg has it, otherwise the fastest one available"""
+        if encoder is not None:
+            available = probe_encoders()
+            # an empty set means probing failed, let ffmpeg report it
+            if available and encoder not in available:
+                raise ValueError(f"Encoder not available in ffmpeg: {encoder}")
         else:
-            logging.debug("Using fall-back software AAC encoder")
+            encoder = select_aac_encoder()
+
+        logging.info(f"Using AAC encoder: {encoder}")
+        if encoder == AAC_ENCODERS[-1]:
             logging.info("Software AAC encoder may be slow")
-            return "aac"
+        return encoder
+
+    def _build_argv_templates(self) -> None:
+        """
+        Build the ffmpeg command lines of the conversions once, only the input 
+        and output files are filled in per file. The encoding one is built on
+        first use, see _encode_argv.
+        """
+        self._encode_template : Optional[Tuple[List[str], List[str]]] = None
+        self._remux_argv = (['ffmpeg', '-i'], [
+            '-map', '0:a',
+            '-vn',
+            '-c:a', 'copy',
+            '-y'])
+
+    @property
+    def _encode_argv(self) -> Tuple[List[str], List[str]]:
+        """Command line template to encode a file, selects the encoder on first use"""
+        if self._encode_template is None:
+            self._encode_template = (['ffmpeg', '-i'], self._encode_args(self._ffmpeg_threads))
+        return self._encode_template
+
+    def _encode_args(self, threads: int) -> List[str]:
+        """ffmpeg output arguments to encode to AAC with the given threads"""
+        return [
+            '-map', '0:a',
+            '-c:a', self.aac_encoder,
+            '-b:a', self.bitrate,
+            *AAC_ENCODER_ARGS.get(self.aac_encoder, []),
+            '-threads', str(threads),
+            # no filter graph beyond the implicit format conversion
+            '-filter_threads', '1',
+            '-y']
 
     def _convert_to_m4a(self, input_file : str, output_file : str) -> None:
-        """Convert a file to .m4a format using ffmpeg-python, if not already"""
+        """Convert a file to .m4a format using ffmpeg, if not already"""
         if not self.re_encode and input_file.lower().endswith('.m4a'):
-            shutil.copy(input_file, output_file)
+            # output is only read by ffmpeg, a link is as good as a copy
+            link_or_copy(input_file, output_file)
+            return
+
+        if self._can_stream_copy(input_file):
+            # already AAC, remux into .m4a without touching the encoder
+            prefix, suffix = self._remux_argv
+            self._run_ffmpeg(prefix + [input_file] + suffix + [output_file])
+            # stream copy keeps the duration, reuse the probe for chapters
+            self._durations[output_file] = self._get_audio_duration(input_file)
+            return
+
+        # only encodes are cached, a remux costs about as much as the lookup
+        cache_path = self._cache_path(input_file)
+        if cache_path is not None and os.path.exists(cache_path):
+            logging.debug(f"Using cached conversion of {input_file}")
+            link_or_copy(cache_path, output_file)
+            return
+
+        if self._should_segment(input_file):
+            self._segment_encode(input_file, output_file)
         else:
-            (
-                ffmpeg
-                .input(input_file)
-                .output(output_file, **{
-                    'c:a': self.aac_encoder, 
-                    'b:a': self.bitrate,
-                    'map': '0:a'
-                })
-                .overwrite_output()
-                .run(quiet=not self.verbose)
-            )
+            prefix, suffix = self._encode_argv
+            self._run_ffmpeg(prefix + [input_file] + suffix + [output_file])
+
+        if cache_path is not None:
+            self._store_in_cache(output_file, cache_path)
+
+    def _should_segment(self, input_file: str) -> bool:
+        """Whether a file is long enough to be encoded in parallel segments"""
+        if not self.segment_length or self._segment_workers < 2:
+            return False
+        return self._get_audio_duration(input_file) > 2 * self.segment_length
+
+    def _segment_encode(self, input_file: str, output_file: str) -> None:
+        """
+        Encode a long file in parallel: encode consecutive time ranges of it 
+        concurrently, then join them back with the concat demuxer. 
+        
+        Each range is decoded straight from the input, so no segment container 
+        is needed for its format. Every encoded segment still starts with the 
+        encoder's priming samples, which leaves a short gap at each join.
+        """
+        duration = self._get_audio_duration(input_file)
+        count = math.ceil(duration / self.segment_length)
+        logging.debug(f"Encoding {input_file} in {count} segments")
+
+        segment_dir = tempfile.mkdtemp(dir=os.path.dirname(output_file), prefix=TEMP_PREFIX)
+        try:
+            # the segments share the threads of this conversion
+            if self._ffmpeg_threads:
+                threads = max(1, self._ffmpeg_threads // self._segment_workers)
+            else:
+                threads = self._threads_per_job(self._segment_workers)
+            suffix = self._encode_args(threads)
+
+            encoded = []
+            segment_argvs = []
+            for i in range(count):
+                start = i * self.segment_length
+                # seek a bit before the segment and decode the lead-in, so 
+                # decoder state carried across frames (e.g. the MP3 bit 
+                # reservoir) is complete at the segment start
+                lead_in = min(start, SEGMENT_LEAD_IN)
+                encoded.append(os.path.join(segment_dir, f"seg_{i:03d}.m4a"))
+                segment_argvs.append(['ffmpeg', 
+                    '-ss', str(start - lead_in), '-i', input_file,
+                    '-ss', str(lead_in), '-t', str(self.segment_length),
+                    *suffix, encoded[-1]])
+
+            with ThreadPoolExecutor(max_workers=self._segment_workers) as executor:
+                for future in [executor.submit(self._run_ffmpeg, argv)
+                    for argv in segment_argvs]:
+                    future.result()
+
+            concat_list = "".join(concat_line(f) for f in encoded)
+            self._run_ffmpeg(['ffmpeg', 
+                '-f', 'concat', '-safe', '0', 
+                '-protocol_whitelist', 'file,pipe', '-i', 'pipe:0',
+                '-c', 'copy', 
+                '-y', output_file], input=concat_list.encode(DEFAULT_ENCODING))
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+
+    def _cache_path(self, input_file: str) -> Optional[str]:
+        """
+        Path of the cached encode of a file, None if caching is disabled.
+        The key only hashes metadata (path, size, mtime and encoding options),
+        not the content. Encodes are always AAC-LC with the layout of their
+        source, so they don't depend on the copy decisions of a build. The
+        encoder is keyed as requested, so a hit doesn't select one.
+        """
+        if self.cache_dir is None:
+            return None
+
+        stat = os.stat(input_file)
+        key = "\0".join([os.path.abspath(input_file), str(stat.st_size),
+            str(stat.st_mtime_ns), self._requested_encoder or "auto", self.bitrate,
+            str(self.segment_length)])
+        digest = hashlib.sha256(key.encode(DEFAULT_ENCODING)).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.m4a")
+
+    @staticmethod
+    def _store_in_cache(output_file: str, cache_path: str) -> None:
+        """Keep a converted file in the cache, failures are not fatal"""
+        temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            link_or_copy(output_file, temp_path)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Failed to cache {output_file}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _run_ffmpeg(self, args: List[str], input: Optional[bytes] = None) -> None:
+        """
+        Run ffmpeg, in quiet mode keep only the tail of stderr for diagnostics,
+        instead of buffering the whole output in memory.
+        :param args: Command line, starting with 'ffmpeg'.
+        :param input: Data to write to ffmpeg's stdin.
+        """
+        args = [args[0], *FFMPEG_GLOBAL_ARGS, *args[1:]]
+        if self.verbose:
+            subprocess.run(args, input=input, check=True)
+            return
+
+        # only errors end up in the tail anyway, and nobody sees the progress
+        args[1:1] = ['-loglevel', 'error', '-nostats']
+        tail : deque = deque(maxlen=STDERR_TAIL_LINES)
+        proc = subprocess.Popen(args,
+            stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE)
+
+        # drain stderr in background, so ffmpeg never blocks on a full pipe
+        drain = threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True)
+        drain.start()
+
+        if input is not None and proc.stdin is not None:
+            try:
+                proc.stdin.write(input)
+                proc.stdin.close()
+            except BrokenPipeError:
+                # ffmpeg exited before reading it all, its stderr tells why
+                pass
+
+        retcode = proc.wait()
+        drain.join()
+        if proc.stderr is not None:
+            proc.stderr.close()
+
+        if retcode != 0:
+            import ffmpeg
+            raise ffmpeg.Error('ffmpeg', b'', b''.join(tail))
+
+    def _probe(self, file_path: str) -> Dict[str, Any]:
+        """Probe a file using PyAV if installed, otherwise ffmpeg-python, cached per file"""
+        if file_path not in self._probes:
+            if av is not None:
+                self._probes[file_path] = self._av_probe(file_path)
+            else:
+                import ffmpeg
+                self._probes[file_path] = ffmpeg.probe(file_path)
+        return self._probes[file_path]
+
+    @staticmethod
+    def _av_probe(file_path: str) -> Dict[str, Any]:
+        """Probe a file with PyAV, in the layout of ffprobe's JSON output"""
+        with av.open(file_path) as container:
+            streams = []
+            duration = None
+            if container.duration is not None:
+                duration = container.duration / av.time_base
+            for stream in container.streams:
+                context = stream.codec_context
+                info = {
+                    'codec_type': stream.type,
+                    'codec_name': context.name,
+                    'bit_rate': str(context.bit_rate or stream.bit_rate or ''),
+                    'profile': context.profile,
+                }
+                if stream.type == 'audio':
+                    info['sample_rate'] = str(context.sample_rate)
+                    info['channels'] = context.layout.nb_channels
+                    # e.g. raw ADTS has no container duration
+                    if (duration is None and stream.duration is not None
+                        and stream.time_base is not None):
+                        duration = float(stream.duration * stream.time_base)
+                streams.append(info)
+
+        probe : Dict[str, Any] = {'streams': streams, 'format': {}}
+        if duration is not None:
+            probe['format']['duration'] = str(duration)
+        return probe
+
+    def _audio_stream(self, file_path: str) -> Dict[str, Any]:
+        """Get the first audio stream (codec, channels, ...), empty if none"""
+        for stream in self._probe(file_path)['streams']:
+            if stream.get('codec_type') == 'audio':
+                return stream
+        return {}
+
+    def _audio_codec(self, file_path: str) -> str:
+        """Get codec name of the first audio stream, empty if none"""
+        return self._audio_stream(file_path).get('codec_name', '')
+
+    def _can_stream_copy(self, file_path: str) -> bool:
+        """
+        Whether the audio can be copied instead of re-encoded: it's already AAC-LC,
+        and either re-encoding is disabled or it's not above the target bitrate.
+        """
+        stream = self._audio_stream(file_path)
+        if stream.get('codec_name') != 'aac':
+            return False
+
+        # the encoded chunks are AAC-LC, and concatenating them with -c copy
+        # keeps only the first file's codec setup, so HE-AAC can't be mixed in
+        if stream.get('profile') != 'LC':
+            return False
+
+        if not self.re_encode:
+            return True
+
+        # re-encoding at about the same or a higher bitrate only loses quality
+        target = parse_bitrate(self.bitrate)
+        bitrate = parse_bitrate(stream.get('bit_rate', ''))
+        if target is None or bitrate is None:
+            return False
+        return bitrate <= target * (1 + BITRATE_TOLERANCE)
 
     def _get_audio_duration(self, file_path: str) -> float:
-        """Get duration in seconds using ffmpeg-python probe"""
-        probe = ffmpeg.probe(file_path)
-        duration = float(probe['format']['duration'])
+        """
+        Get duration in seconds, read from the mp4 header if possible,
+        otherwise using ffprobe. Cached per file.
+        """
+        if file_path in self._durations:
+            return self._durations[file_path]
+
+        duration = None
+        # only mp4 files have the header, don't open other files twice
+        if (file_path not in self._probes and 
+            os.path.splitext(file_path)[1].lower() in MP4_EXTENSIONS):
+            duration = mp4_duration(file_path)
+        # a process just for the duration, unless probing is in-process anyway
+        value_probed = False
+        if duration is None and file_path not in self._probes and av is None:
+            duration = self._probe_duration(file_path)
+            value_probed = True
+        if duration is None:
+            probe_duration = self._probe(file_path)['format'].get('duration')
+            if probe_duration is not None:
+                duration = float(probe_duration)
+            elif not value_probed:
+                duration = self._probe_duration(file_path)
+        if duration is None:
+            raise ValueError(f"Unknown duration of {file_path}")
+
+        self._durations[file_path] = duration
         return duration
 
+    @staticmethod
+    def _probe_duration(file_path: str) -> Optional[float]:
+        """
+        Get duration in seconds with ffprobe printing only that value, 
+        much lighter than a full JSON probe. None if it's not known.
+        """
+        result = subprocess.run(['ffprobe', '-v', 'error', 
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
+            capture_output=True)
+        if result.returncode != 0:
+            import ffmpeg
+            raise ffmpeg.Error('ffprobe', result.stdout, result.stderr)
+
+        try:
+            return float(result.stdout)
+        except ValueError:
+            # 'N/A' for streams without a known duration
+            return None
+
     @abstractmethod
     def chapters(self) -> str:
         """Abstract method to generate chapters"""
@@ -78,6 +469,22 @@ class AudioBookBuilder(ABC):
         """Abstract method to get raw audio"""
         pass
 
+    def raw_audio_args(self, raw_audio_path: str) -> List[str]:
+        """ffmpeg input arguments for the raw audio"""
+        return ['-i', raw_audio_path]
+
+    def raw_audio_stdin(self) -> Optional[bytes]:
+        """Data piped to ffmpeg's stdin for the raw audio, if any"""
+        return None
+
+    @staticmethod
+    def _mux_args(output_file: str) -> List[str]:
+        """ffmpeg muxer arguments for the output file"""
+        if os.path.splitext(output_file)[1].lower() in MP4_EXTENSIONS:
+            # moov (and chapters) in front, so players don't read the whole file
+            return ['-movflags', '+faststart']
+        return []
+
     @abstractmethod
     def cleanup(self) -> None:
         """Abstract method to clean up temporary files"""
@@ -96,17 +503,33 @@ class AudioBookBuilder(ABC):
             # Get the raw audio file
             raw_audio_path = self.raw_audio()
             
-            # FIXME: I can't write the right ffmpeg-python code
-            subprocess.run([
+            # write into the temporary directory first, so a failed build
+            # never leaves a partial output file behind
+            temp_output = os.path.join(self.temp_dir, 
+                "final" + os.path.splitext(output_file)[1])
+
+            # ffmpeg-python only emits inputs whose streams are mapped, and the
+            # ffmetadata input has no stream, so the command is built directly
+            self._run_ffmpeg([
                 'ffmpeg',
-                '-i', raw_audio_path,
-                '-i', chapters_path,
+                # a broken chunk fails the build instead of a truncated book
+                '-xerror',
+                *self.raw_audio_args(raw_audio_path),
+                '-f', 'ffmetadata', '-i', chapters_path,
+                '-map', '0:a',
                 '-map_metadata', '1',
+                '-map_chapters', '1',
                 '-c', 'copy',
-                '-y', output_file
-            ], check=True,
-            stdout=subprocess.DEVNULL if not self.verbose else None,
-            stderr=subprocess.DEVNULL if not self.verbose else None)
+                # pure remux, more threads don't help
+                '-threads', '1',
+                # few large writes instead of one per packet
+                '-flush_packets', '0',
+                '-max_muxing_queue_size', '1024',
+                *self._mux_args(output_file),
+                '-y', temp_output
+            ], input=self.raw_audio_stdin())
+
+            os.replace(temp_output, output_file)
             
         finally:
             if cleanup:
@@ -117,14 +540,26 @@ class DirectoryBuilder(AudioBookBuilder):
         keywords_file : str,
         bitrate : str = DEFAULT_BITRATE,
         re_encode : bool = True,
-        verbose : bool = False) -> None:
+        verbose : bool = False,
+        temp_root : Optional[str] = None,
+        jobs : Optional[int] = None,
+        cache_dir : Optional[str] = None,
+        segment_length : float = 0,
+        encoder : Optional[str] = None) -> None:
         """
         AudiobookBuilder class to build an audiobook from media files.
         :param directory: Path to the directory containing media files.
-        :param file_keywords: List of keywords to match files.
+        :param keywords_file: Path to the list file of keywords to match files.
         :param bitrate: Bitrate for re-encoding audio files.
-        :param re_encode: Force re-encode all files, even if they are already in .m4a format.
+        :param re_encode: Re-encode files to AAC at the bitrate, except AAC-LC audio not above
+            it, which is copied. If False, .m4a files and AAC-LC audio at any bitrate are copied.
         :param verbose: Verbose mode.
+        :param temp_root: Directory to create temporary files in, None for the system default.
+        :param jobs: Number of files converted concurrently, None for the number of CPUs.
+        :param cache_dir: Directory to keep converted files between runs, None to disable.
+        :param segment_length: Length in seconds of the segments a long file is split into
+            and encoded in parallel, 0 to disable.
+        :param encoder: ffmpeg AAC encoder, None to pick the fastest one available.
         """
         if not os.path.isdir(directory):
             raise FileNotFoundError(f"Directory not found: {directory}")
@@ -142,63 +577,113 @@ class DirectoryBuilder(AudioBookBuilder):
 
         with open(keywords_file, "r", encoding=DEFAULT_ENCODING) as f:
             keywords = f.read().splitlines()
-            # remove file extensions from keywords
-            self.keywords = [os.path.splitext(k)[0] for k in keywords]
+            # remove file extensions from keywords, and skip blank lines
+            keywords = [os.path.splitext(k)[0] for k in keywords if k.strip()]
+
+        # a repeated keyword would match, and convert, the same file again
+        self.keywords = tuple(dict.fromkeys(keywords))
+        if len(self.keywords) != len(keywords):
+            logging.warning(f"Dropped {len(keywords) - len(self.keywords)} duplicate keyword(s)")
 
         if not self.keywords:
             raise ValueError("No keywords found in the keywords file.")
 
-        self.temp_dir = tempfile.mkdtemp()
+        # chapter index of each keyword
+        self._keyword_index : Dict[str, int] = {
+            keyword: idx for idx, keyword in enumerate(self.keywords)}
+        # match all keywords in one pass, longest first so that
+        # e.g. 'chapter 10' is not taken for 'chapter 1'
+        self._keyword_re = re.compile('|'.join(re.escape(k) 
+            for k in sorted(self._keyword_index, key=len, reverse=True)))
+        self._automaton = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self._keyword_index:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+        self.temp_dir = tempfile.mkdtemp(dir=temp_root, prefix=TEMP_PREFIX)
         logging.debug(f"Temporary directory created: {self.temp_dir}")
 
         self._converted_files = []
+        # chapter blocks and concat list lines, in chapter order
+        self._chapter_blocks : List[str] = []
+        self._concat_lines : List[str] = []
+        # running total of the durations in seconds, and last chapter end in ms
+        self._chapter_total = 0.0
+        self._chapter_end = 0
+        # directory of the converted files, see _chunk_directory()
+        self._chunk_dir = self.temp_dir
+        # file whose sample rate and channels copied files must have, see _can_stream_copy()
+        self._reference_file : Optional[str] = None
 
         super().__init__(bitrate=bitrate, re_encode=re_encode, 
-            verbose=verbose)
+            verbose=verbose, jobs=jobs, cache_dir=cache_dir, 
+            segment_length=segment_length, encoder=encoder)
 
     def chapters(self) -> str:
         """Implementation of the abstract method to generate chapters"""
         metadata_path = os.path.join(self.temp_dir, "chapters.txt")
-        with open(metadata_path, "w", encoding=DEFAULT_ENCODING) as f:
-            f.write(";FFMETADATA1\n")
-            current_time = 0
-            for idx, file in enumerate(self.converted_files):
-                duration = super()._get_audio_duration(file)
-                f.write("[CHAPTER]\n")
-                f.write("TIMEBASE=1/1000\n")
-                f.write(f"START={int(current_time * 1000)}\n")
-                f.write(f"END={int((current_time + duration) * 1000)}\n")
-                f.write(f"title={idx+1:02d}. {self.keywords[idx]}\n")
-                current_time += duration
+        # the blocks are built while the files are converted
+        self.converted_files
+
+        write_file(metadata_path, 
+            "".join([";FFMETADATA1\n"] + self._chapter_blocks).encode(DEFAULT_ENCODING))
         return metadata_path
     
     def raw_audio(self) -> str:
-        """Implementation of the abstract method to get raw audio"""
-        concat_list_path = os.path.join(self.temp_dir, "inputs.txt")
-        with open(concat_list_path, "w", encoding=DEFAULT_ENCODING) as f:
-            for file in self.converted_files:
-                f.write(f"file '{file}'\n")
-
-        # FIXME: duplicated filename
-        joined_audio_path = os.path.join(self.temp_dir, "joined.m4b")
-        (
-            ffmpeg
-            .input(concat_list_path, format='concat', safe=0)
-            .output(joined_audio_path, c='copy')
-            .overwrite_output()
-            .run(quiet=not self.verbose)
-        )
-
-        return joined_audio_path
+        """
+        Implementation of the abstract method to get raw audio.
+        The concat list is piped to ffmpeg's stdin, see raw_audio_stdin(), 
+        and joined together with the chapters in a single pass by build().
+        """
+        return "pipe:0"
+
+    def raw_audio_args(self, raw_audio_path: str) -> List[str]:
+        """Read the raw audio with the concat demuxer"""
+        return ['-f', 'concat', '-safe', '0', 
+            '-protocol_whitelist', 'file,pipe', '-i', raw_audio_path]
+
+    def raw_audio_stdin(self) -> Optional[bytes]:
+        """Concat list of the converted files, kept in memory"""
+        self.converted_files
+        return "".join(self._concat_lines).encode(DEFAULT_ENCODING)
 
     def cleanup(self) -> None:
         """Implementation of the abstract method to clean up temporary files"""
+        if self._chunk_dir != self.temp_dir and os.path.exists(self._chunk_dir):
+            shutil.rmtree(self._chunk_dir)
+            logging.debug(f"Temporary directory removed: {self._chunk_dir}")
+
         if os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
             logging.debug(f"Temporary directory removed: {self.temp_dir}")
         else:
             logging.warning(f"Temporary directory not found: {self.temp_dir}")
 
+    def _chunk_directory(self, matched_files: List[str]) -> str:
+        """
+        Directory to write the converted files to. They are written once and
+        read once by the final mux, so prefer a RAM-backed directory if they
+        fit, otherwise use the temporary directory.
+        """
+        # copied files are hard-linked in place, which needs the same file system
+        if not self.re_encode:
+            return self.temp_dir
+
+        if not os.path.isdir(RAM_DIR) or not os.access(RAM_DIR, os.W_OK):
+            return self.temp_dir
+
+        # inputs' size as the estimate, keep at least as much free for others
+        needed = sum(os.path.getsize(f) for f in matched_files)
+        if shutil.disk_usage(RAM_DIR).free < needed * 2:
+            logging.debug(f"Not enough space in {RAM_DIR} for converted files")
+            return self.temp_dir
+
+        chunk_dir = tempfile.mkdtemp(dir=RAM_DIR, prefix=TEMP_PREFIX)
+        logging.debug(f"Temporary directory created: {chunk_dir}")
+        return chunk_dir
+
     @property
     def converted_files(self) -> List[str]:
         """List of converted files"""
@@ -209,31 +694,189 @@ class DirectoryBuilder(AudioBookBuilder):
         if not matched_files:
             raise FileNotFoundError("No matching files found.")
 
-        converted_files = []
+        # ffmpeg runs as a subprocess, so threads are enough to keep all cores busy
+        workers = min(self.jobs, len(matched_files))
+
+        # the concat demuxer takes the codec parameters of the first file
+        self._reference_file = matched_files[0]
+
+        if self._can_concat_directly(matched_files, workers):
+            logging.info("All files are compatible AAC, concatenating them as they are")
+            for file in matched_files:
+                self._append_chapter(file)
+            self._converted_files = matched_files
+            return self._converted_files
+
+        self._chunk_dir = self._chunk_directory(matched_files)
+
+        # filled by index as conversions complete, to keep the chapter order
+        converted_files : List[Optional[str]] = [None] * len(matched_files)
+
+        self._ffmpeg_threads = self._threads_per_job(workers)
+        # what is left of the jobs goes to the segments of long files
+        self._segment_workers = max(1, self.jobs // workers)
+        self._build_argv_templates()
         # Use tqdm for progress bar if verbose is False
-        files = matched_files if self.verbose else tqdm(matched_files, 
-            desc="Converting files", unit="file")
-        for idx, file in enumerate(files):
-            output_file = os.path.join(self.temp_dir, f"{idx:02d}.m4a")
+        from tqdm import tqdm
+        done = self._conversions(matched_files, workers)
+        if not self.verbose:
+            done = tqdm(done, total=len(matched_files), 
+                desc="Converting files", unit="file")
+        for idx, output_file in done:
+            converted_files[idx] = output_file
+            # add the chapters that are now in order, while others convert
+            while (len(self._chapter_blocks) < len(converted_files) 
+                and converted_files[len(self._chapter_blocks)] is not None):
+                self._append_chapter(converted_files[len(self._chapter_blocks)])
+
+        if None in converted_files:
+            raise RuntimeError("Not all files were converted.")
+
+        self._converted_files = [file for file in converted_files if file]
+        return self._converted_files
+
+    def _can_stream_copy(self, file_path: str) -> bool:
+        """
+        Also require the sample rate and channels of the first matched file,
+        which the concatenated chunks all have to share.
+        """
+        if not super()._can_stream_copy(file_path):
+            return False
+        if self._reference_file is None:
+            return True
+
+        # probes are cached, the first file is probed at most once
+        layout = self._audio_layout(file_path)
+        return layout is not None and layout == self._audio_layout(self._reference_file)
+
+    def _audio_layout(self, file_path: str) -> Optional[Tuple[str, int]]:
+        """Sample rate and channels of the first audio stream, None if not known"""
+        stream = self._audio_stream(file_path)
+        sample_rate, channels = stream.get('sample_rate'), stream.get('channels')
+        if not sample_rate or not channels:
+            return None
+        return str(sample_rate), int(channels)
+
+    def _can_concat_directly(self, matched_files: List[str], workers: int) -> bool:
+        """
+        Whether the matched files can be concatenated without any conversion:
+        all are mp4 files of AAC audio that can be stream-copied, with the 
+        same streams, profile, sample rate and channels.
+        """
+        if any(os.path.splitext(f)[1].lower() not in MP4_EXTENSIONS 
+            for f in matched_files):
+            return False
 
-            super()._convert_to_m4a(input_file=file, output_file=output_file)
-            converted_files.append(output_file)
+        # probe in parallel, the results are cached for the conversions
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if not all(executor.map(self._can_stream_copy, matched_files)):
+                return False
 
-        self._converted_files = converted_files
-        return converted_files
+        layouts = set()
+        for file in matched_files:
+            layout = self._audio_layout(file)
+            # unknown parameters can't be shown to match
+            if layout is None:
+                return False
+            layouts.add((
+                tuple(s.get('codec_type') for s in self._probe(file)['streams']),
+                self._audio_stream(file).get('profile'),
+                *layout))
+        return len(layouts) == 1
+
+    def _conversions(self, matched_files: List[str], 
+        workers: int) -> Iterator[Tuple[int, str]]:
+        """Convert the matched files, yields the index and output file as each completes"""
+        if workers == 1:
+            # no pool at all, for encoders that dislike concurrent sessions
+            for idx, file in enumerate(matched_files):
+                yield self._convert_indexed(idx, file)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._convert_indexed, idx, file)
+                for idx, file in enumerate(matched_files)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _append_chapter(self, file: str) -> None:
+        """Add the chapter block and concat line of the next converted file"""
+        idx = len(self._chapter_blocks)
+        # chapter boundaries in ms, rounded from the running sum in seconds so
+        # per-chapter rounding errors do not add up
+        self._chapter_total += self._get_audio_duration(file)
+        end = round(self._chapter_total * 1000)
+        self._chapter_blocks.append("[CHAPTER]\n"
+            "TIMEBASE=1/1000\n"
+            f"START={self._chapter_end}\n"
+            f"END={end}\n"
+            f"title={idx+1:02d}. {metadata_value(self.keywords[idx])}\n")
+        self._chapter_end = end
+        self._concat_lines.append(concat_line(file))
+
+    def _convert_indexed(self, idx: int, file: str) -> Tuple[int, str]:
+        """Convert the idx-th matched file, returns the index and output file"""
+        output_file = os.path.join(self._chunk_dir, f"{idx:02d}.m4a")
+        self._convert_to_m4a(input_file=file, output_file=output_file)
+        # read the duration in the worker, chapters() then only looks it up
+        self._get_audio_duration(output_file)
+        return idx, output_file
+
+    def _match_keyword(self, name: str) -> Optional[str]:
+        """Keyword found in a file name, the leftmost then longest one, None if none"""
+        if self._automaton is None:
+            match = self._keyword_re.search(name)
+            return match.group(0) if match else None
+
+        best = None
+        for end, keyword in self._automaton.iter(name):
+            # same pick as the regex: smallest start, then longest keyword
+            rank = (end - len(keyword) + 1, -len(keyword))
+            if best is None or rank < best[0]:
+                best = (rank, keyword)
+        return best[1] if best else None
 
     def _match_files(self) -> List[str]:
-        """Match files in the directory that contain any of the keywords"""
+        """Match media files in the directory that contain any of the keywords"""
+        # matched files grouped by keyword, to keep the chapter order
+        groups : List[List[str]] = [[] for _ in self.keywords]
+        unmatched : List[str] = []
+        # don't collect names nobody will see
+        report = logging.getLogger().isEnabledFor(logging.WARNING)
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                # skip covers, playlists, sub-directories..., the type
+                # comes with the directory read on most platforms
+                if (not is_media_extension(os.path.splitext(entry.name)[1]) 
+                    or not entry.is_file()):
+                    continue
+                total += 1
+                keyword = self._match_keyword(entry.name)
+                if keyword is not None:
+                    groups[self._keyword_index[keyword]].append(entry.path)
+                elif report:
+                    unmatched.append(entry.name)
+
+        missing = [k for k, group in zip(self.keywords, groups) if not group]
+        if missing:
+            raise FileNotFoundError(f"No file matched {len(missing)} keyword(s): "
+                + ", ".join(f"'{k}'" for k in missing[:5]))
+
+        # one file per keyword, so the chapter titles line up with the files
         matched = []
-        for keyword in self.keywords:
-            for file in os.listdir(self.directory):
-                if keyword in file:
-                    matched.append(os.path.join(self.directory, file))
+        for keyword, group in zip(self.keywords, groups):
+            if len(group) > 1:
+                # prefer the closest match, i.e. the shortest name
+                group.sort(key=lambda f: (len(f), f))
+                logging.warning(f"Multiple files matched '{keyword}', "
+                    f"using {os.path.basename(group[0])}")
+            matched.extend(group[:1])
 
-        if len(matched) != len([f for f in os.listdir(self.directory) if 
-                                is_media_extension(os.path.splitext(f)[1])]):
+        if unmatched:
             logging.warning("Not all files matched."
-                f" Found {len(matched)} out of {len(os.listdir(self.directory))} files.")
+                f" Found {len(matched)} out of {total} media files,"
+                f" {len(unmatched)} unmatched (first 5: {unmatched[:5]})")
 
         return matched
     
@@ -242,14 +885,24 @@ class SingleBuilder(AudioBookBuilder):
         chapter_file : str,
         bitrate : str = DEFAULT_BITRATE,
         re_encode : bool = True,
-        verbose : bool = False) -> None:
+        verbose : bool = False,
+        temp_root : Optional[str] = None,
+        cache_dir : Optional[str] = None,
+        segment_length : float = 0,
+        encoder : Optional[str] = None) -> None:
         """
         AudiobookBuilder class to build an audiobook from a single media file.
         :param file: Path to the media file.
         :param chapter_file: Path to the raw chapter file.
         :param bitrate: Bitrate for re-encoding audio files.
-        :param re_encode: Force re-encode all files, even if they are already in .m4a format.
+        :param re_encode: Re-encode files to AAC at the bitrate, except AAC-LC audio not above
+            it, which is copied. If False, .m4a files and AAC-LC audio at any bitrate are copied.
         :param verbose: Verbose mode.
+        :param temp_root: Directory to create temporary files in, None for the system default.
+        :param cache_dir: Directory to keep converted files between runs, None to disable.
+        :param segment_length: Length in seconds of the segments a long file is split into
+            and encoded in parallel, 0 to disable.
+        :param encoder: ffmpeg AAC encoder, None to pick the fastest one available.
         """
         if not os.path.isfile(file):
             raise FileNotFoundError(f"File not found: {file}")
@@ -260,48 +913,58 @@ class SingleBuilder(AudioBookBuilder):
         self.file = os.path.abspath(file)
         self.chapters_file = os.path.abspath(chapter_file)
 
-        self.temp_dir = tempfile.mkdtemp()
+        self.temp_dir = tempfile.mkdtemp(dir=temp_root, prefix=TEMP_PREFIX)
+        # a single file is converted, let ffmpeg use all CPUs
         super().__init__(bitrate=bitrate, re_encode=re_encode, 
-            verbose=verbose)
+            verbose=verbose, jobs=1, cache_dir=cache_dir, 
+            segment_length=segment_length, encoder=encoder)
+        # a single conversion, segments of a long file can use all CPUs
+        self._segment_workers = os.cpu_count() or 1
 
     def chapters(self) -> str:
         """
         Convert chapter data from '00:00:01 title' format to ffmetadata format.
         """
         metadata_path = os.path.join(self.temp_dir, "chapters.txt")
-        duration = int(super()._get_audio_duration(self.file) * 1000) / 1000
+        duration_ms = round(super()._get_audio_duration(self.file) * 1000)
+
+        chapter_times = []
+        chapter_titles = []
+        # Parse the input file to extract times (in ms) and titles
         with open(self.chapters_file, "r", encoding=DEFAULT_ENCODING) as f:
-            with open(metadata_path, "w", encoding=DEFAULT_ENCODING) as out:
-                # Write ffmetadata header
-                out.write(";FFMETADATA1\n")
-                chapter_times = []
-                chapter_titles = []
-
-                # Parse the input file to extract times and titles
-                for idx, line in enumerate(f):
-                    parts = line.strip().split(" ", 1)
-                    if len(parts) != 2:
-                        raise ValueError(f"Invalid chapter format: {line.strip()}")
-                    time_str, title = parts
-                    # Convert time string (HH:MM:SS) to seconds
-                    h, m, s = map(int, time_str.split(":"))
-                    current_time = h * 3600 + m * 60 + s
-                    chapter_times.append(current_time)
-                    chapter_titles.append(f"{idx+1:02d}. {title.strip()}")
-
-                for i in range(len(chapter_times)):
-                    start_time = chapter_times[i]
-                    end_time = chapter_times[i + 1] if i + 1 < len(chapter_times) else duration
-                    out.write("[CHAPTER]\n")
-                    out.write("TIMEBASE=1/1000\n")
-                    out.write(f"START={start_time * 1000}\n")
-                    out.write(f"END={end_time * 1000}\n")
-                    out.write(f"title={chapter_titles[i]}\n")
+            for line in f.read().splitlines():
+                if not line.strip():
+                    continue
+
+                match = CHAPTER_LINE_RE.fullmatch(line)
+                if match is None:
+                    raise ValueError(f"Invalid chapter format: {line.strip()}")
+                h, m, s, title = match.groups()
+                chapter_times.append((int(h) * 3600 + int(m) * 60 + int(s)) * 1000)
+                chapter_titles.append(f"{len(chapter_titles)+1:02d}. {metadata_value(title)}")
+
+        end_times = chapter_times[1:] + [duration_ms]
+
+        # Write ffmetadata at once
+        lines = [";FFMETADATA1\n"]
+        for start_time, end_time, title in zip(chapter_times, end_times, chapter_titles):
+            lines.append("[CHAPTER]\n"
+                "TIMEBASE=1/1000\n"
+                f"START={start_time}\n"
+                f"END={end_time}\n"
+                f"title={title}\n")
+
+        write_file(metadata_path, "".join(lines).encode(DEFAULT_ENCODING))
 
         return metadata_path
     
     def raw_audio(self) -> str:
         """Implementation of the abstract method to get raw audio"""
+        if self._can_stream_copy(self.file):
+            # the final mux copies the audio stream anyway, read it directly
+            logging.debug(f"Copying audio directly from {self.file}")
+            return self.file
+
         output_file = os.path.join(self.temp_dir, "single.m4a")
         super()._convert_to_m4a(input_file=self.file,
             output_file=output_file)
@@ -321,6 +984,10 @@ def main_build(args : argparse.Namespace) -> None:
 
     list_file: str = args.list
 
+    # keep temporary files on the same file system as the output,
+    # so the final file is moved into place without copying
+    temp_root = os.path.dirname(output_file)
+
     # TODO: archive
     builder : AudioBookBuilder
     if os.path.isdir(input_path):
@@ -336,7 +1003,12 @@ def main_build(args : argparse.Namespace) -> None:
             keywords_file=list_file,
             bitrate=args.bitrate,
             re_encode=not args.not_re_encode,
-            verbose=args.verbose)
+            verbose=args.verbose,
+            temp_root=temp_root,
+            jobs=args.jobs,
+            cache_dir=args.cache_dir,
+            segment_length=args.segment_length,
+            encoder=args.encoder)
     elif os.path.isfile(input_path):
         if not os.path.exists(list_file):
             raise FileNotFoundError(f"List file not found: {list_file}")
@@ -345,7 +1017,11 @@ def main_build(args : argparse.Namespace) -> None:
             chapter_file=list_file,
             bitrate=args.bitrate,
             re_encode=not args.not_re_encode,
-            verbose=args.verbose)
+            verbose=args.verbose,
+            temp_root=temp_root,
+            cache_dir=args.cache_dir,
+            segment_length=args.segment_length,
+            encoder=args.encoder)
     else:
         raise FileNotFoundError(f"File or directory not found: {input_path}")
 
@@ -359,14 +1035,28 @@ def parser_build(subparser: argparse._SubParsersAction) -> None:
         help="Build an audiobook from media files")
     cat_parser.add_argument("-b", "--bitrate", type=str, default=DEFAULT_BITRATE,
         help="Re-encode audio bitrate")
+    cat_parser.add_argument("--cache-dir", type=str, default=None,
+        help=f"Keep converted files in this directory to reuse them on re-runs,"
+            f" e.g. {os.path.join(CACHE_DIR, 'chunks')}")
+    cat_parser.add_argument("--encoder", type=str, default=None,
+        help="AAC encoder of ffmpeg, e.g. aac_at or libfdk_aac,"
+            " default to the fastest one available")
     cat_parser.add_argument("--not-cleanup", action="store_true", default=False,
         help="Do not delete temporary files")
     cat_parser.add_argument("--not-re-encode", action="store_true", default=False,
-        help="Force re-encode all files, even if they are already in .m4a format")
+        help="Copy .m4a files as they are and AAC-LC audio at any bitrate, by default"
+            " only AAC-LC audio not above --bitrate is copied and the rest re-encoded")
+    cat_parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="Number of files converted concurrently, default to the number of CPUs,"
+            " 1 converts them one by one (e.g. for hardware encoders)")
     cat_parser.add_argument("-l", "--list", type=str, default="list.txt",
         help="List file to generate the chapter info",)
     cat_parser.add_argument("-o", "--output", type=str, default="output.m4b",
         help="Output file name (with .m4b extension)")
+    cat_parser.add_argument("--segment-length", type=float, default=0,
+        help="Split files longer than twice this many seconds into segments"
+            " encoded in parallel, default 0 (disabled). Each join between"
+            " segments has a short gap (about 20-50 ms) from encoder priming")
     cat_parser.add_argument("PATH", type=str, 
         help="Input directory containing media files, or single media file",)
     cat_parser.set_defaults(func=main_build)
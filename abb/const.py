@@ -1,4 +1,31 @@
 
+import os
+
 DEFAULT_BITRATE = "192k"
 
+# relative bitrate difference, within which AAC audio is copied instead of re-encoded
+BITRATE_TOLERANCE = 0.1
+
 DEFAULT_ENCODING = "utf-8"
+
+# AAC encoders in order of preference, hardware encoders first
+AAC_ENCODERS = ["aac_at", "aac_mf", "libfdk_aac", "aac"]
+
+# extra ffmpeg options per AAC encoder, for its fastest constant bitrate mode
+AAC_ENCODER_ARGS = {
+    "aac_at": ["-aac_at_mode", "cbr"],
+}
+
+# buffer size for copying large media files
+COPY_BUFSIZE = 1024 * 1024
+
+# seconds decoded and dropped before each segment of a segmented encode
+SEGMENT_LEAD_IN = 1.0
+
+# prefix of temporary directories
+TEMP_PREFIX = "abb_"
+
+# directory for files kept between runs
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "abb")
@@ -0,0 +1,137 @@
+import functools
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import time
+
+from typing import (Dict, Optional, Set)
+
+from .const import (AAC_ENCODERS, CACHE_DIR, DEFAULT_BITRATE, DEFAULT_ENCODING)
+
+# cache file of the fastest encoder per machine
+ENCODER_CACHE = "encoder.json"
+
+# length of the noise encoded to benchmark encoders, in seconds
+BENCHMARK_SECONDS = 10
+
+# length of the noise encoded to check a cached encoder still works, in seconds
+VALIDATE_SECONDS = 0.1
+
+# timeout of each benchmark encode, in seconds
+BENCHMARK_TIMEOUT = 30
+
+@functools.lru_cache(maxsize=1)
+def probe_encoders() -> Set[str]:
+    """Probe the audio encoders supported by ffmpeg, only once per process"""
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+            capture_output=True, text=True)
+    except OSError as e:
+        logging.warning(f"Failed to probe ffmpeg encoders: {e}")
+        return set()
+
+    if result.returncode != 0:
+        logging.warning("Failed to probe ffmpeg encoders: "
+            f"ffmpeg exited with {result.returncode}")
+        return set()
+
+    return set(re.findall(r'^\s*A[A-Z.]+\s+(\S+)', result.stdout, re.MULTILINE))
+
+def benchmark_encoder(encoder: str, seconds: float = BENCHMARK_SECONDS) -> Optional[float]:
+    """
+    Encode a few seconds of noise with the encoder, encoders take shortcuts
+    on silence so it tells little about real throughput.
+    :param encoder: ffmpeg AAC encoder name.
+    :param seconds: Length of the noise to encode.
+    :return: Wall time in seconds, None if the encoder doesn't work.
+    """
+    start = time.perf_counter()
+    try:
+        result = subprocess.run([
+            'ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'error', '-nostats',
+            '-f', 'lavfi', '-i', 'anoisesrc=r=44100:a=0.1',
+            '-ac', '2',
+            '-t', str(seconds),
+            '-c:a', encoder, '-b:a', DEFAULT_BITRATE,
+            '-f', 'null', '-'
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        timeout=BENCHMARK_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.debug(f"Benchmark of {encoder} failed: {e}")
+        return None
+
+    if result.returncode != 0:
+        logging.debug(f"Benchmark of {encoder} failed: exit code {result.returncode}")
+        return None
+
+    return time.perf_counter() - start
+
+def _cache_key() -> str:
+    """Key of this machine in the encoder cache, the cache directory may be shared"""
+    return f"{platform.node()}-{platform.system()}-{platform.machine()}"
+
+def _load_cache() -> Dict[str, str]:
+    """Load the encoder cache, empty if missing or unreadable"""
+    path = os.path.join(CACHE_DIR, ENCODER_CACHE)
+    try:
+        with open(path, "r", encoding=DEFAULT_ENCODING) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+def _save_cache(cache: Dict[str, str]) -> None:
+    """Save the encoder cache, atomically so concurrent runs never read it half-written"""
+    path = os.path.join(CACHE_DIR, ENCODER_CACHE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(temp_path, "w", encoding=DEFAULT_ENCODING) as f:
+            json.dump(cache, f, indent=2)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logging.debug(f"Failed to save encoder cache: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@functools.lru_cache(maxsize=1)
+def select_aac_encoder() -> str:
+    """
+    Select the fastest working AAC encoder. Candidates are benchmarked
+    once per machine and the winner is cached on disk.
+    :return: ffmpeg AAC encoder name, the software 'aac' as fall-back.
+    """
+    available = probe_encoders()
+    candidates = [e for e in AAC_ENCODERS if e in available]
+
+    cache = _load_cache()
+    key = _cache_key()
+    cached = cache.get(key)
+    if cached in candidates:
+        # hardware encoders may be listed but unusable, e.g. after a driver change
+        if cached == AAC_ENCODERS[-1] or benchmark_encoder(cached, VALIDATE_SECONDS) is not None:
+            return cached
+        logging.debug(f"Cached encoder {cached} no longer works")
+
+    selected = AAC_ENCODERS[-1]
+    if len(candidates) > 1:
+        timings = {}
+        for encoder in candidates:
+            elapsed = benchmark_encoder(encoder)
+            if elapsed is not None:
+                logging.debug(f"Benchmark of {encoder}: {elapsed:.2f}s")
+                timings[encoder] = elapsed
+
+        if timings:
+            selected = min(timings, key=lambda e: timings[e])
+    elif candidates:
+        selected = candidates[0]
+
+    if available:
+        cache[key] = selected
+        _save_cache(cache)
+
+    return selected
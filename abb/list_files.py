@@ -5,7 +5,6 @@ import logging
 
 from typing import List
 
-from .archive import ArchiveExtractor
 from .utils import is_media_extension
 
 class ListFiles:
@@ -20,6 +19,8 @@ class ListFiles:
 
         self.path = path
         self.filters = filters
+        # compiled once, applied in order to each name
+        self._filters = [re.compile(p) for p in filters]
 
     def list(self) -> List[str]:
         """
@@ -27,23 +28,24 @@ class ListFiles:
         :return: List of files in the directory.
         """
         files = []
-        for filename in os.listdir(self.path):
-            # Check if the item is a file
-            if os.path.isfile(os.path.join(self.path, filename)):
-                name, ext = os.path.splitext(filename)
-                if not is_media_extension(ext):
-                    logging.debug(f"Skipping non-media file: {filename}")
-                    continue
+        with os.scandir(self.path) as it:
+            for entry in it:
+                # Check if the item is a file, scandir caches the file type
+                if entry.is_file():
+                    name, ext = os.path.splitext(entry.name)
+                    if not is_media_extension(ext):
+                        logging.debug(f"Skipping non-media file: {entry.name}")
+                        continue
 
-                files.append(self._filter(name) + ext)
+                    files.append(self._filter(name) + ext)
 
         files.sort()
         return files
     
     def _filter(self, str) -> str:
         result = str
-        for pattern in self.filters:
-            result = re.sub(pattern, '', result)
+        for pattern in self._filters:
+            result = pattern.sub('', result)
         return result
     
 def main_list(args : argparse.Namespace) -> None:
@@ -61,6 +63,7 @@ def main_list(args : argparse.Namespace) -> None:
     if os.path.isfile(path):
         raise NotImplementedError("Reading files in archives is not implemented yet.")
 
+        from .archive import ArchiveExtractor
         with ArchiveExtractor(path) as temp_dir:
             list_files = ListFiles(path=str(temp_dir), 
                 filters=filters)
@@ -1,6 +1,50 @@
 from __future__ import annotations
 
-from typing import Set
+import os
+import shutil
+import struct
+
+from typing import BinaryIO, FrozenSet, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+# ioctl request to clone a file on Linux (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+AUDIO_EXTENSIONS: FrozenSet[str] = frozenset({
+    "mp3",
+    "wav",
+    "flac",
+    "aac",
+    "ogg",
+    "m4a",
+    "wma",
+    "aiff",
+    "alac",
+    "opus",
+    "amr"
+})
+
+VIDEO_EXTENSIONS: FrozenSet[str] = frozenset({
+    "mp4",
+    "mkv",
+    "avi",
+    "mov",
+    "wmv",
+    "flv",
+    "webm",
+    "m4v",
+    "3gp",
+    "mpeg",
+    "mpg"
+})
+
+# built once at import, looked up for every file of a directory
+MEDIA_EXTENSIONS: FrozenSet[str] = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
 
 
 def is_media_extension(ext: str) -> bool:
@@ -17,36 +61,207 @@ def is_media_extension(ext: str) -> bool:
         return False
 
     # Normalize extension: remove leading dot and convert to lowercase
-    normalized_ext: str = ext.lower().lstrip(".")
-
-    audio_extensions: Set[str] = {
-        "mp3",
-        "wav",
-        "flac",
-        "aac",
-        "ogg",
-        "m4a",
-        "wma",
-        "aiff",
-        "alac",
-        "opus",
-        "amr"
-    }
-
-    video_extensions: Set[str] = {
-        "mp4",
-        "mkv",
-        "avi",
-        "mov",
-        "wmv",
-        "flv",
-        "webm",
-        "m4v",
-        "3gp",
-        "mpeg",
-        "mpg"
-    }
-
-    common_media_extensions: Set[str] = audio_extensions | video_extensions
-
-    return normalized_ext in common_media_extensions
+    return ext.lower().lstrip(".") in MEDIA_EXTENSIONS
+
+
+def parse_bitrate(bitrate: str) -> Optional[int]:
+    """
+    Parse a bitrate in ffmpeg notation.
+
+    Args:
+        bitrate: Bitrate, e.g. "192k", "1.5M" or "128000"
+
+    Returns:
+        Bitrate in bits per second, or None if it can't be parsed.
+    """
+    multipliers = {"k": 1000, "m": 1000 * 1000}
+
+    value = bitrate.strip().lower()
+    multiplier = multipliers.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+
+    try:
+        return int(float(value) * multiplier)
+    except ValueError:
+        return None
+
+
+def _find_box(f: BinaryIO, box_type: bytes, end: Optional[int] = None) -> Optional[int]:
+    """
+    Find a box among the sibling boxes starting at the current file position.
+
+    Args:
+        f: MP4 file opened in binary mode, positioned at the first box
+        box_type: Four-character box type, e.g. b"moov"
+        end: Offset where the sibling boxes end, None for end of file
+
+    Returns:
+        Size of the box payload with the file positioned at its start,
+        or None if the box is not found.
+    """
+    while end is None or f.tell() < end:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+
+        size, kind = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            # box extends to the end of the file
+            current = f.tell()
+            size = f.seek(0, 2) - current + header_size
+            f.seek(current)
+
+        if size < header_size:
+            return None
+
+        if kind == box_type:
+            return size - header_size
+
+        f.seek(size - header_size, 1)
+
+    return None
+
+
+def mp4_duration(path: str) -> Optional[float]:
+    """
+    Read the duration of an MP4/M4A file from its mvhd box, without ffprobe.
+
+    Args:
+        path: Path to the MP4 file
+
+    Returns:
+        Duration in seconds, or None if the file can't be parsed or
+        doesn't record it.
+    """
+    try:
+        with open(path, "rb") as f:
+            moov_size = _find_box(f, b"moov")
+            if moov_size is None:
+                return None
+
+            if _find_box(f, b"mvhd", f.tell() + moov_size) is None:
+                return None
+
+            version = f.read(4)[0]
+            if version == 1:
+                timescale, duration = struct.unpack(">16xIQ", f.read(28))
+            else:
+                timescale, duration = struct.unpack(">8xII", f.read(16))
+    except (OSError, IndexError, struct.error):
+        return None
+
+    if timescale == 0:
+        return None
+
+    # fragmented files leave it 0, some muxers all ones, for unknown
+    if duration == 0 or duration == (1 << (64 if version == 1 else 32)) - 1:
+        return None
+
+    return duration / timescale
+
+
+def _reflink(src: str, dst: str) -> None:
+    """
+    Clone a file with a copy-on-write reflink.
+
+    Args:
+        src: Source file path
+        dst: Destination file path
+
+    Raises:
+        OSError: If the platform or file system doesn't support reflinks.
+    """
+    if fcntl is None:
+        raise OSError("Reflink is not supported on this platform")
+
+    with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+        fcntl.ioctl(f_out.fileno(), FICLONE, f_in.fileno())
+
+
+def _copy_file_range(src: str, dst: str) -> None:
+    """
+    Copy a file in the kernel with copy_file_range, which also shares
+    the data blocks on file systems supporting it (btrfs, xfs, nfs, ...).
+
+    Args:
+        src: Source file path
+        dst: Destination file path
+
+    Raises:
+        OSError: If the platform or file system doesn't support it.
+    """
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range is not supported on this platform")
+
+    try:
+        with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+            remaining = os.fstat(f_in.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(f_in.fileno(), f_out.fileno(), remaining)
+                if copied == 0:
+                    # some file systems (FUSE, ecryptfs, ...) copy nothing
+                    # without an error
+                    raise OSError(f"copy_file_range stopped with {remaining} bytes left")
+                remaining -= copied
+    except OSError:
+        # don't leave a partial copy behind for the fall-back
+        if os.path.exists(dst):
+            os.remove(dst)
+        raise
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """
+    Place a read-only copy of a file, avoiding copying data if possible.
+
+    Tries a hard link first, then a reflink, then an in-kernel
+    copy_file_range, and falls back to a regular copy (which uses sendfile
+    or the platform's native copy where available).
+
+    Args:
+        src: Source file path
+        dst: Destination file path, must not be modified afterwards
+    """
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+
+    try:
+        _reflink(src, dst)
+        return
+    except OSError:
+        pass
+
+    try:
+        _copy_file_range(src, dst)
+        return
+    except OSError:
+        pass
+
+    shutil.copyfile(src, dst)
+
+
+def write_file(path: str, data: bytes) -> None:
+    """
+    Write data to a file with raw os.write calls, bypassing Python's
+    text and buffer layers, usually in a single system call.
+
+    Args:
+        path: File path, created or truncated
+        data: Content of the file
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+    finally:
+        os.close(fd)